@@ -1 +1 @@
-from .project import git_root, is_ignored
+from .project import git_root, is_ignored, is_ignored_many
@@ -1,16 +1,86 @@
+import os
 import subprocess
 import logging
 
+_MISSING = object()
+_ROOT_CACHE = _MISSING
+_REPO_CACHE = _MISSING
+
+
+def _pygit2_repo():
+    """Open the repo through pygit2 (in-process libgit2) once, None when unavailable"""
+    global _REPO_CACHE
+    if _REPO_CACHE is _MISSING:
+        _REPO_CACHE = None
+        try:
+            import pygit2
+
+            path = pygit2.discover_repository(os.getcwd())
+            if path:
+                _REPO_CACHE = pygit2.Repository(path)
+        except ImportError:
+            logging.debug("pygit2 not available, falling back to git subprocess")
+        except Exception as e:
+            logging.debug("pygit2 discovery failed: %s", e)
+    return _REPO_CACHE
+
 
 def git_root():
+    """Get the root of the git repo, cached for the lifetime of the process"""
+    global _ROOT_CACHE
+    if _ROOT_CACHE is not _MISSING:
+        return _ROOT_CACHE
+    repo = _pygit2_repo()
+    if repo is not None and repo.workdir:
+        _ROOT_CACHE = repo.workdir.rstrip(os.sep)
+        return _ROOT_CACHE
     try:
-        return subprocess.check_output(["git", "rev-parse", "--show-toplevel"], stderr=subprocess.STDOUT).decode("utf-8").strip()
+        _ROOT_CACHE = subprocess.check_output(["git", "rev-parse", "--show-toplevel"], stderr=subprocess.STDOUT).decode("utf-8").strip()
     except subprocess.CalledProcessError as e:
         logging.debug("return code: %d", e.returncode)
-        return None
+        _ROOT_CACHE = None
+    return _ROOT_CACHE
+
+
+def clear_project_root_cache():
+    global _ROOT_CACHE, _REPO_CACHE
+    _ROOT_CACHE = _MISSING
+    _REPO_CACHE = _MISSING
+
+
+def _relative_to_root(path, root):
+    if os.path.isabs(path):
+        return os.path.relpath(path, root)
+    return path
+
+
+def is_ignored_many(paths):
+    """Check a batch of paths with a single git check-ignore process, returns the subset that is ignored"""
+    paths = list(paths)
+    if not paths:
+        return set()
+    repo = _pygit2_repo()
+    if repo is not None and repo.workdir:
+        root = repo.workdir.rstrip(os.sep)
+        return {path for path in paths if repo.path_is_ignored(_relative_to_root(path, root))}
+    proc = subprocess.Popen(
+        ["git", "check-ignore", "--stdin"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    stdout, stderr = proc.communicate("\n".join(paths).encode("utf-8"))
+    if proc.returncode not in (0, 1):
+        logging.debug("return code: %d, stderr: %s", proc.returncode, stderr)
+        return set(paths)
+    return {line for line in stdout.decode("utf-8").splitlines() if line}
 
 
 def is_ignored(path):
+    repo = _pygit2_repo()
+    if repo is not None and repo.workdir:
+        root = repo.workdir.rstrip(os.sep)
+        return repo.path_is_ignored(_relative_to_root(path, root))
     try:
         subprocess.check_output(["git", "check-ignore", path], stderr=subprocess.STDOUT)
         return True
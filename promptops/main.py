@@ -22,18 +22,18 @@ import traceback
 
 import logging
 
+# keep the module-level imports light: anything that pulls in requests or
+# prompt_toolkit is imported inside the branch that needs it so that paths
+# like --version don't pay for the full import chain
 from promptops import settings
 from promptops import settings_store
-from promptops import version_check
-from promptops import user
-
-from promptops.feedback import feedback
 
 ENDPOINT_ENV = "PROMPTOPS_ENDPOINT"
 
 
 def runner_mode(args):
     from local_runner.main import entry_point
+    from promptops.feedback import feedback
 
     feedback({"event": "runner_mode"})
     entry_point(args)
@@ -51,6 +51,8 @@ def check_if_installed():
 
 
 def query_mode(args):
+    from promptops.feedback import feedback
+
     if args.verbose:
         logging.basicConfig(level=logging.DEBUG)
     else:
@@ -120,22 +122,111 @@ def handle_exception(prev_handler):
     return inner
 
 
-def entry_alias():
-    # Set the global exception handler
-    sys.excepthook = handle_exception(sys.excepthook)
+def _start_user_session(config=False):
+    """Version check plus registration (first run) or history sync.
 
-    import warnings
-    warnings.filterwarnings("ignore", module='thefuzz')
+    Returns True when the registration flow ran."""
+    from promptops import version_check
+    from promptops import user
 
-    import colorama
+    if not user.has_registered() or config:
+        version_check.version_check()
+        if sys.stdin.isatty() and sys.stdout.isatty():
+            user.register()
+        return True
+    from concurrent.futures import ThreadPoolExecutor
+    from promptops import history
+
+    # the version check and the history sync are independent round-trips to
+    # the service; run them in parallel so the wall time is the slower of
+    # the two instead of the sum
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        check = pool.submit(version_check.version_check)
+        update = pool.submit(history.update_history)
+        check.result()
+        update.result()
+    return False
+
+
+def _index_parser(alias):
+    subparser = ArgumentParser(
+        prog=f"{alias} index",
+        usage=f"{alias} index [action]",
+        description=f"{alias} index: manage the indexed data",
+    )
+    subparser.add_argument("action", choices=["list", "add", "remove", "test"], help="list or update the index")
+    subparser.add_argument("--source", help="the source to add or remove")
+    subparser.add_argument("--query", help="query to test with")
+    return subparser
+
+
+_ALIAS_FLAGS = {
+    "--verbose": "verbose",
+    "-v": "verbose",
+    "--version": "version",
+    "--config": "config",
+    "--shell-config": "shell_config",
+    "--install": "install",
+}
+
+
+def _parse_alias_args(argv):
+    """Single pass over argv for the alias entry point.
+
+    argparse's REMAINDER handling re-scans the option strings for every
+    positional, which gets expensive for long natural-language questions.
+    Returns None for anything this scanner doesn't understand (including
+    --help) so argparse can take over and produce its usual messages."""
+    from types import SimpleNamespace
+
+    args = SimpleNamespace(
+        verbose=False,
+        version=False,
+        config=False,
+        shell_config=False,
+        install=False,
+        history_context=settings.history_context,
+        explain=settings.request_explanation,
+        mode=settings.model,
+        question=[],
+    )
+    i = 0
+    while i < len(argv):
+        token = argv[i]
+        if not token.startswith("-"):
+            # everything from the first non-flag token on is the question,
+            # same as the REMAINDER positional
+            args.question = argv[i:]
+            break
+        flag, eq, value = token.partition("=")
+        if not eq and flag in _ALIAS_FLAGS:
+            setattr(args, _ALIAS_FLAGS[flag], True)
+        elif not eq and flag == "--explain":
+            args.explain = True
+        elif not eq and flag == "--no-explain":
+            args.explain = False
+        elif flag in ("--history-context", "--mode"):
+            if not eq:
+                i += 1
+                if i >= len(argv):
+                    return None
+                value = argv[i]
+            if flag == "--mode":
+                if value not in ("fast", "accurate"):
+                    return None
+                args.mode = value
+            else:
+                try:
+                    args.history_context = int(value)
+                except ValueError:
+                    return None
+        else:
+            return None
+        i += 1
+    return args
 
-    colorama.init()
-    # get the name of the calling script
-    alias = os.path.basename(sys.argv[0])
 
-    settings_store.load()
-    if endpoint := os.environ.get(ENDPOINT_ENV):
-        settings.endpoint = endpoint
+def _alias_parser(alias):
     parser = ArgumentParser(
         prog=alias,
         usage=f"{alias} [options] <question>\nexample: {alias} list running ec2 instances",
@@ -170,8 +261,44 @@ def entry_alias():
         "--mode", default=settings.model, choices=["fast", "accurate"], help="fast or accurate (default: %(default)s)"
     )
     parser.add_argument("question", nargs=REMAINDER, help="the question to ask")
-    registered = user.has_registered()
-    args = parser.parse_args()
+    return parser
+
+
+def entry_alias():
+    # Set the global exception handler
+    sys.excepthook = handle_exception(sys.excepthook)
+
+    import warnings
+    warnings.filterwarnings("ignore", module='thefuzz')
+
+    import colorama
+
+    colorama.init()
+    # get the name of the calling script
+    alias = os.path.basename(sys.argv[0])
+
+    settings_store.load()
+    if endpoint := os.environ.get(ENDPOINT_ENV):
+        settings.endpoint = endpoint
+
+    # the first token already decides the mode for the subcommand paths, so
+    # dispatch directly instead of paying for the full parser (argparse gets
+    # super-linear on long REMAINDER questions)
+    if len(sys.argv) > 1 and sys.argv[1] in ("workflow", "recipe", "index"):
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+        _start_user_session()
+        if sys.argv[1] == "index":
+            sub_args = _index_parser(alias).parse_args(sys.argv[2:])
+            return index_mode(sub_args)
+        from types import SimpleNamespace
+
+        return recipe_mode(SimpleNamespace(question=sys.argv[1:], verbose=False))
+
+    args = _parse_alias_args(sys.argv[1:])
+    if args is None:
+        # help output, unknown flags, and bad values go through argparse so
+        # the user gets the usual messages
+        args = _alias_parser(alias).parse_args()
 
     if args.shell_config:
         from promptops.shells import get_shell
@@ -184,6 +311,7 @@ def entry_alias():
 
     if args.version:
         from promptops.version import __version__
+        from promptops import version_check
 
         print(__version__)
         r = version_check.version_check()
@@ -196,55 +324,19 @@ def entry_alias():
         logging.basicConfig(level=logging.DEBUG)
     else:
         logging.basicConfig(level=logging.INFO, format="%(message)s")
-    version_check.version_check()
-
-    if not registered or args.config:
-        if sys.stdin.isatty() and sys.stdout.isatty():
-            user.register()
+    if _start_user_session(config=args.config):
         args.history_context = settings.history_context
-    else:
-        from promptops import history
-
-        history.update_history()
 
     if args.question and len(args.question) > 0:
         if args.question[0] == 'workflow' or args.question[0] == 'recipe':
             return recipe_mode(args)
         elif args.question[0] == 'index':
-            # index subcommand
-            subparser = ArgumentParser(
-                prog=f"{alias} index",
-                usage=f"{alias} index [action]",
-                description=f"{alias} index: manage the indexed data",
-            )
-            subparser.add_argument("action", choices=["list", "add", "remove", "test"], help="list or update the index")
-            subparser.add_argument("--source", help="the source to add or remove")
-            subparser.add_argument("--query", help="query to test with")
-            sub_args = subparser.parse_args(args.question[1:])
+            sub_args = _index_parser(alias).parse_args(args.question[1:])
             return index_mode(sub_args)
     query_mode(args)
 
 
-def entry_main():
-    # Set the global exception handler
-    sys.excepthook = handle_exception(sys.excepthook)
-
-    import warnings
-    warnings.filterwarnings("ignore", module='thefuzz')
-
-    import colorama
-
-    colorama.init()
-
-    settings_store.load()
-    if endpoint := os.environ.get(ENDPOINT_ENV):
-        settings.endpoint = endpoint
-    parser = ArgumentParser()
-    parser.add_argument("--version", action="store_true", help="print version and exit")
-    parser.add_argument("--verbose", "-v", action="store_true", help="verbose output")
-    parser.add_argument("--config", action="store_true", help="reconfigure")
-    parser.add_argument("--skip-config", action="store_true", help="skips initial configuration and uses defaults")
-    subparsers = parser.add_subparsers()
+def _add_query_parser(subparsers):
     parser_question = subparsers.add_parser("query", help="ask questions")
     parser_question.add_argument(
         "--history-context",
@@ -274,28 +366,71 @@ def entry_main():
     parser_question.add_argument("question", nargs=REMAINDER, help="the question to ask")
     parser_question.set_defaults(func=query_mode)
 
+
+def _add_runner_parser(subparsers):
     parser_runner = subparsers.add_parser("runner", help="run commands from slack")
     parser_runner.add_argument("--role-level", action="store_true", help="register as role-level runner")
     parser_runner.set_defaults(func=runner_mode)
 
+
+def _add_recipe_parser(subparsers):
     parser_workflow = subparsers.add_parser("recipe", help="run a complex or multi-stepped script")
     parser_workflow.add_argument("question", nargs=REMAINDER, help="the question to generate scripts for")
     parser_workflow.set_defaults(func=recipe_mode)
 
+
+def _add_index_parser(subparsers):
     parser_index = subparsers.add_parser("index", help="manage the indexed data")
     parser_index.add_argument("action", choices=["list", "add", "remove", "test"], help="list or update the index")
     parser_index.add_argument("--source", help="the source to add or remove")
     parser_index.add_argument("--query", help="query to test with")
     parser_index.set_defaults(func=index_mode)
 
+
+def _add_lookup_parser(subparsers):
     parser_lookup = subparsers.add_parser("lookup", help="extended reverse search, use --config to configure in your shell")
     parser_lookup.add_argument("--config", action="store_true", help="print configuration for your shell")
     parser_lookup.add_argument("command", nargs=REMAINDER, help="the command to lookup")
     parser_lookup.set_defaults(func=lookup_mode)
 
-    args = parser.parse_args()
 
-    registered = user.has_registered()
+def entry_main():
+    # Set the global exception handler
+    sys.excepthook = handle_exception(sys.excepthook)
+
+    import warnings
+    warnings.filterwarnings("ignore", module='thefuzz')
+
+    import colorama
+
+    colorama.init()
+
+    settings_store.load()
+    if endpoint := os.environ.get(ENDPOINT_ENV):
+        settings.endpoint = endpoint
+    parser = ArgumentParser()
+    parser.add_argument("--version", action="store_true", help="print version and exit")
+    parser.add_argument("--verbose", "-v", action="store_true", help="verbose output")
+    parser.add_argument("--config", action="store_true", help="reconfigure")
+    parser.add_argument("--skip-config", action="store_true", help="skips initial configuration and uses defaults")
+    subparsers = parser.add_subparsers()
+    # only build the subparser for the selected command; constructing all of
+    # them (and their defaults) on every invocation slows down dispatch
+    command = next((arg for arg in sys.argv[1:] if not arg.startswith("-")), None)
+    builders = {
+        "query": _add_query_parser,
+        "runner": _add_runner_parser,
+        "recipe": _add_recipe_parser,
+        "index": _add_index_parser,
+        "lookup": _add_lookup_parser,
+    }
+    if command in builders:
+        builders[command](subparsers)
+    else:
+        for build in builders.values():
+            build(subparsers)
+
+    args = parser.parse_args()
 
     if not hasattr(args, "func"):
         if args.version:
@@ -303,11 +438,15 @@ def entry_main():
 
             print(__version__)
 
+            from promptops import version_check
+
             r = version_check.version_check()
             if not r.update_required:
                 print("latest version:", r.latest_version)
             sys.exit(0)
         if args.config:
+            from promptops import user
+
             if sys.stdin.isatty() and sys.stdout.isatty():
                 user.register()
             args.history_context = settings.history_context
@@ -328,15 +467,12 @@ def entry_main():
         args.func(args)
         return
 
-    version_check.version_check()
-    if not registered and not args.skip_config:
-        if sys.stdin.isatty() and sys.stdout.isatty():
-            user.register()
-        args.history_context = settings.history_context
-    elif not args.skip_config:
-        from promptops import history
+    if args.skip_config:
+        from promptops import version_check
 
-        history.update_history()
+        version_check.version_check()
+    elif _start_user_session():
+        args.history_context = settings.history_context
     args.func(args)
 
 
@@ -32,15 +32,14 @@ def _set_processed(git_root):
 
 def _discover_indexable_files(root, accept_file: typing.Callable[[str, str], bool] = None) -> list[str]:
     accept_file = accept_file or (lambda _, fname: fname.lower() == "readme.md")
-    files = []
+    candidates = []
     for (dirpath, dirnames, filenames) in os.walk(root):
         for filename in filenames:
-            full_name = os.path.join(dirpath, filename)
-            if not accept_file(dirpath, filename) or gitaware.is_ignored(full_name):
-                continue
-            files.append(full_name)
+            if accept_file(dirpath, filename):
+                candidates.append(os.path.join(dirpath, filename))
         dirnames[:] = filter(lambda d: d != ".git", dirnames)
-    return files
+    ignored = gitaware.is_ignored_many(candidates)
+    return [f for f in candidates if f not in ignored]
 
 
 def _pretty_option(root, file, is_selected):
@@ -1,11 +1,13 @@
-import json
 import logging
 import os
 import queue
 import subprocess
+import threading
 import time
 
 import colorama
+import ijson
+import orjson
 import requests
 import sys
 
@@ -21,6 +23,28 @@ from promptops.ui.input import non_empty_input
 from promptops.ui.prompts import confirm, GO_BACK
 from promptops.ui.vim import edit_with_vim
 
+# larger than the iter_lines() default of 512 so streamed NDJSON isn't
+# reassembled from many tiny chunks
+STREAM_CHUNK_SIZE = 65536
+
+
+def _make_session() -> requests.Session:
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        max_retries=requests.adapters.Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504)),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["user-agent"] = user.user_agent()
+    return session
+
+
+# a recipe run issues several requests to the same host back to back; reuse
+# one session so the TCP+TLS handshake is only paid once
+_SESSION = _make_session()
+
 LANG_SHELL = 'shell'
 LANG_TF = 'terraform'
 LANG_OPTIONS = [LANG_TF, LANG_SHELL]
@@ -31,30 +55,62 @@ class StreamException(Exception):
 
 
 
+def _iter_stream_events(response):
+    """Yield JSON events from a streamed response as the bytes arrive,
+    without buffering whole lines first"""
+    response.raw.decode_content = True
+    return ijson.items(response.raw, "", multiple_values=True, use_float=True)
+
+
 def handle_execution_response(recipe, response, loading):
-    completed_queue = queue.Queue()
-    started_queue = queue.Queue()
+    # the loader only ever does non-blocking get()s, so SimpleQueue is enough
+    # and skips Queue's task-tracking lock on every put
+    completed_queue = queue.SimpleQueue()
+    started_queue = queue.SimpleQueue()
     file_loader = None
     loading_parameters = False
-    for line in response.iter_lines():
-        if line:
-            json_line = json.loads(line.decode('utf-8'))
-            if json_line.get('type') == 'files':
-                loading.stop()
-                file_loader = CancellableMultiLoader(started_queue, completed_queue)
-                for file in json_line.get('files'):
-                    started_queue.put(file)
-            elif json_line.get('type') == 'execution':
-                if not loading_parameters:
-                    completed_queue.put('gathering parameters')
-                    loading_parameters = False
-                recipe.setdefault('execution', []).append(json_line)
-                completed_queue.put(json_line.get('key'))
-            elif json_line.get('parameter'):
-                if not loading_parameters:
-                    started_queue.put('gathering parameters')
-                    loading_parameters = True
-                recipe.setdefault('parameters', []).append(json_line)
+    # the same list objects live for the whole stream, no need to look them
+    # up again on every event
+    execution = recipe.setdefault('execution', [])
+    parameters = recipe.setdefault('parameters', [])
+    def _handle_files(json_line):
+        nonlocal file_loader
+        loading.stop()
+        file_loader = CancellableMultiLoader(started_queue, completed_queue)
+        for file in json_line.get('files'):
+            started_queue.put(file)
+
+    def _handle_execution(json_line):
+        nonlocal loading_parameters
+        if not loading_parameters:
+            completed_queue.put('gathering parameters')
+            loading_parameters = False
+        execution.append(json_line)
+        completed_queue.put(json_line.get('key'))
+
+    def _handle_parameter(json_line):
+        nonlocal loading_parameters
+        if not loading_parameters:
+            started_queue.put('gathering parameters')
+            loading_parameters = True
+        parameters.append(json_line)
+
+    # one hash lookup per event instead of walking an if/elif chain
+    dispatch = {
+        'files': _handle_files,
+        'execution': _handle_execution,
+        'parameter': _handle_parameter,
+    }
+
+    for json_line in _iter_stream_events(response):
+        if json_line:
+            handler = dispatch.get(json_line.get('type'))
+            if handler is None and json_line.get('parameter'):
+                # parameter events are keyed by the parameter field rather
+                # than a type
+                handler = _handle_parameter
+            if handler is not None:
+                handler(json_line)
             elif json_line.get('error'):
                 raise StreamException
             else:
@@ -75,12 +131,9 @@ def regenerate_recipe_execution(recipe, clarification, error=None, loading=None)
     if error:
         req['error'] = error
 
-    response = requests.post(
+    response = _SESSION.post(
         settings.endpoint + "/recipe/stream/regenerate",
         json=req,
-        headers={
-            "user-agent": f"promptops-cli; user_id={user.user_id()}",
-        },
         stream=True
     )
     recipe['execution'] = []
@@ -95,12 +148,9 @@ def get_recipe_execution(recipe: dict, loading=None):
         "id": recipe['id'],
     }
 
-    response = requests.post(
+    response = _SESSION.post(
         settings.endpoint + "/recipe/stream/execution",
         json=req,
-        headers={
-            "user-agent": f"promptops-cli; user_id={user.user_id()}",
-        },
         stream=True
     )
 
@@ -117,20 +167,19 @@ def clarify_steps(recipe, clarification, loading=None):
         "clarification": clarification,
     }
 
-    response = requests.post(
+    response = _SESSION.post(
         settings.endpoint + "/recipe/stream/clarify",
         json=req,
-        headers={"user-agent": f"promptops-cli; user_id={user.user_id()}"},
         stream=True
     )
 
     recipe['steps'] = []
     count_minus = 0
-    for line in response.iter_lines():
+    for line in response.iter_lines(chunk_size=STREAM_CHUNK_SIZE):
         if line:
             if loading:
                 loading.stop()
-            json_line = json.loads(line.decode('utf-8'))
+            json_line = orjson.loads(line)
             if json_line.get('id'):
                 recipe['id'] = json_line.get('id')
             elif json_line.get('error'):
@@ -172,23 +221,20 @@ def init_recipe(prompt: str, language: str, workflow_id=None, loading=None):
     if language == LANG_SHELL:
         req['shell'] = os.environ.get("SHELL")
 
-    response = requests.post(
+    response = _SESSION.post(
         settings.endpoint + "/recipe/stream/init",
         json=req,
-        headers={
-            "user-agent": f"promptops-cli; user_id={user.user_id()}",
-        },
         stream=True
     )
 
     recipe = {
         'steps': []
     }
-    for line in response.iter_lines():
+    for line in response.iter_lines(chunk_size=STREAM_CHUNK_SIZE):
         if line:
             if loading:
                 loading.stop()
-            json_line = json.loads(line.decode('utf-8'))
+            json_line = orjson.loads(line)
             if json_line.get('id'):
                 recipe['id'] = json_line.get('id')
             elif json_line.get('error'):
@@ -220,12 +266,9 @@ def get_recipe(prompt: str, language: str, workflow_id=None):
     if language == LANG_SHELL:
         req['shell'] = os.environ.get("SHELL")
 
-    response = requests.post(
+    response = _SESSION.post(
         settings.endpoint + "/recipe/init",
         json=req,
-        headers={
-            "user-agent": f"promptops-cli; user_id={user.user_id()}",
-        },
     )
 
     if response.status_code == 404:
@@ -238,16 +281,30 @@ def get_recipe(prompt: str, language: str, workflow_id=None):
 
 def run(script: str, lang: str = "shell") -> (int, Optional[str]):
     if lang == "shell":
-        proc = subprocess.run(
+        proc = subprocess.Popen(
             script, shell=True, start_new_session=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
         )
-        if proc.stdout and str(proc.stdout) != "":
-            sys.stdout.write(proc.stdout.decode("utf-8"))
-        if proc.stderr and str(proc.stderr) != "":
-            sys.stdout.write(proc.stderr.decode("utf-8"))
-        sys.stdout.flush()
-
-        return proc.returncode, str(proc.stderr)
+        stderr_chunks = []
+
+        def pump(pipe, collect=None):
+            # read1 returns whatever is available, so output shows up as the
+            # script produces it instead of after it exits
+            for chunk in iter(lambda: pipe.read1(8192), b''):
+                sys.stdout.buffer.write(chunk)
+                sys.stdout.buffer.flush()
+                if collect is not None:
+                    collect.append(chunk)
+            pipe.close()
+
+        thread_out = threading.Thread(target=pump, args=[proc.stdout])
+        thread_err = threading.Thread(target=pump, args=[proc.stderr, stderr_chunks])
+        thread_out.start()
+        thread_err.start()
+        thread_out.join()
+        thread_err.join()
+
+        returncode = proc.wait()
+        return returncode, b"".join(stderr_chunks).decode("utf-8")
     else:
         raise NotImplementedError(f"{lang} not implemented yet")
 
@@ -292,12 +349,9 @@ def save_steps(recipe):
         'steps': recipe.get('steps')
     }
 
-    response = requests.post(
+    response = _SESSION.post(
         settings.endpoint + "/recipe/steps",
         json=req,
-        headers={
-            "user-agent": f"promptops-cli; user_id={user.user_id()}",
-        }
     )
 
     if response.status_code != 200:
@@ -337,20 +391,21 @@ def save_flow(recipe):
     print()
     recipe = edit_parameters(recipe)
 
-    req = {
+    name = non_empty_input("Enter a name for the saved workflow: ")
+    # the execution array can get large; serialize it with orjson instead of
+    # the pure-python encoder requests would use for json=
+    payload = orjson.dumps({
         'id': recipe.get('id'),
         'trace_id': trace.trace_id,
-        'name': non_empty_input("Enter a name for the saved workflow: "),
+        'name': name,
         'parameters': recipe.get('parameters'),
         'execution': recipe.get('execution')
-    }
+    })
 
-    response = requests.post(
+    response = _SESSION.post(
         settings.endpoint + "/recipe/save",
-        json=req,
-        headers={
-            "user-agent": f"promptops-cli; user_id={user.user_id()}",
-        }
+        data=payload,
+        headers={"content-type": "application/json"},
     )
 
     if response.status_code != 200:
@@ -359,9 +414,7 @@ def save_flow(recipe):
 
 
 def list_recipes():
-    response = requests.get(settings.endpoint + f"/recipe?trace_id={trace.trace_id}", headers={
-            "user-agent": f"promptops-cli; user_id={user.user_id()}",
-    })
+    response = _SESSION.get(settings.endpoint + f"/recipe?trace_id={trace.trace_id}")
 
     if response.status_code != 200:
         print("error", response.json(), "code", response.status_code)
@@ -376,11 +429,13 @@ def available_recipes():
         print("You don't have any saved recipes. To create a recipe try 'um recipe <prompt>'")
         return None
 
-    print("Select from available recipes: ")
+    # everything the retry loop needs is computed once up front; UI.input()
+    # deactivates the instance, so a fresh UI per round trip is still needed
     names = [p.get('name') for p in recipes]
+    header = "Select from available recipes: "
     selected = None
     while not selected:
-        ui = selections.UI(names, is_loading=False)
+        ui = selections.UI(names, is_loading=False, header=header)
         recipe_selection = ui.input()
         print()
 
@@ -389,7 +444,7 @@ def available_recipes():
         if confirmed != GO_BACK:
             selected = recipes[recipe_selection]
         else:
-            print("\nSelect from available recipes: ")
+            print()
     return selected
 
 
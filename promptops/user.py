@@ -28,6 +28,7 @@ def user_id() -> str:
         return f.read().strip()
 
 
+@lru_cache(maxsize=1)
 def user_agent() -> str:
     return f"promptops-cli; user_id={user_id()}"
 
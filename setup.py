@@ -38,6 +38,8 @@ setup(
     python_requires=">=3.9",
     install_requires=[
         "colorama~=0.4.6",
+        "ijson~=3.2.0",
+        "orjson~=3.9.0",
         "requests~=2.31.0",
         "websockets~=11.0.3",
         "detect-secrets~=1.4.0",
@@ -0,0 +1,25 @@
+from promptops.main import _parse_alias_args, _alias_parser
+
+
+def test_matches_argparse():
+    cases = [
+        ["list", "running", "ec2", "instances"],
+        ["--verbose", "how", "do", "i", "tail", "a", "file"],
+        ["-v", "--no-explain", "foo"],
+        ["--history-context", "5", "foo"],
+        ["--history-context=5", "foo"],
+        ["--mode", "fast", "foo"],
+        ["--version"],
+        ["--config"],
+        [],
+        ["how", "-v", "trailing", "--mode"],
+    ]
+    for argv in cases:
+        args = _parse_alias_args(argv)
+        expected = _alias_parser("um").parse_args(argv)
+        assert vars(args) == vars(expected), argv
+
+
+def test_falls_back_to_argparse():
+    for argv in [["--help"], ["-h"], ["--unknown", "q"], ["--mode", "bogus"], ["--history-context", "x"]]:
+        assert _parse_alias_args(argv) is None, argv